@@ -0,0 +1,38 @@
+import unittest
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, TransactionTestCase
+from django.test.runner import DiscoverRunner
+
+
+def iter_tests(suite):
+    """Yield every test in a (possibly parallel) test suite"""
+    for test in getattr(suite, 'subsuites', suite):
+        if isinstance(test, unittest.TestSuite):
+            yield from iter_tests(test)
+        else:
+            yield test
+
+
+class TestCaseOnlyRunner(DiscoverRunner):
+    """Test runner that refuses test classes flushing the whole database"""
+
+    def build_suite(self, *args, **kwargs):
+        suite = super().build_suite(*args, **kwargs)
+        self.check_suite(suite)
+
+        return suite
+
+    def check_suite(self, suite):
+        """Raise if any test uses TransactionTestCase instead of TestCase"""
+        offenders = sorted({
+            type(test).__qualname__ for test in iter_tests(suite)
+            if isinstance(test, TransactionTestCase) and
+            not isinstance(test, TestCase)
+        })
+
+        if offenders:
+            raise ImproperlyConfigured(
+                'Use django.test.TestCase instead of TransactionTestCase '
+                f'in: {", ".join(offenders)}'
+            )
@@ -0,0 +1,30 @@
+import unittest
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from core.test_runner import TestCaseOnlyRunner
+
+
+class TestRunnerTests(SimpleTestCase):
+
+    def test_check_suite_allows_test_case(self):
+        """Test that TestCase based tests pass the suite check"""
+        class SampleTests(TestCase):
+            def test_sample(self):
+                pass
+
+        suite = unittest.TestSuite([SampleTests('test_sample')])
+
+        TestCaseOnlyRunner().check_suite(suite)
+
+    def test_check_suite_rejects_transaction_test_case(self):
+        """Test that TransactionTestCase based tests are rejected"""
+        class SampleTests(TransactionTestCase):
+            def test_sample(self):
+                pass
+
+        suite = unittest.TestSuite([SampleTests('test_sample')])
+
+        with self.assertRaises(ImproperlyConfigured):
+            TestCaseOnlyRunner().check_suite(suite)
@@ -1,20 +1,35 @@
-import tempfile
+import io
 import os
 from PIL import Image
 
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.test import APIClient, APIRequestFactory, \
+                                 force_authenticate
 
 from core.models import Recipe, Tag, Ingredient
 
-from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.serializers import RecipeDetailSerializer
+from recipe.views import RecipeViewSet
 
 
 RECEPIES_URL = reverse('recipe:recipe-list')
+RECIPE_CREATE_VIEW = RecipeViewSet.as_view({'post': 'create'})
+
+
+def _sample_jpeg_bytes():
+    """Return the bytes of a small JPEG image"""
+    buf = io.BytesIO()
+    Image.new('RGB', (10, 10)).save(buf, format='JPEG')
+
+    return buf.getvalue()
+
+
+SAMPLE_JPEG = _sample_jpeg_bytes()
 
 
 def image_upload_url(recipe_id):
@@ -37,18 +52,43 @@ def sample_ingredient(user, name='Cinnamon'):
     return Ingredient.objects.create(user=user, name=name)
 
 
+def bulk_sample_tags(user, names):
+    """Create and return sample tags in a single query"""
+    return Tag.objects.bulk_create(
+        [Tag(user=user, name=name) for name in names]
+    )
+
+
+def bulk_sample_ingredients(user, names):
+    """Create and return sample ingredients in a single query"""
+    return Ingredient.objects.bulk_create(
+        [Ingredient(user=user, name=name) for name in names]
+    )
+
+
+SAMPLE_RECIPE_DEFAULTS = {
+    'title': 'Sample recipe',
+    'time_minutes': 10,
+    'price': 5.00,
+}
+
+
 def sample_recipe(user, **params):
     """Create and return a sample recipe"""
-    defaults = {
-        'title': 'Sample recipe',
-        'time_minutes': 10,
-        'price': 5.00,
-    }
-    defaults.update(params)
+    defaults = dict(SAMPLE_RECIPE_DEFAULTS, **params)
 
     return Recipe.objects.create(user=user, **defaults)
 
 
+def bulk_sample_recipes(user, count, **params):
+    """Create and return several sample recipes in a single query"""
+    defaults = dict(SAMPLE_RECIPE_DEFAULTS, **params)
+
+    return Recipe.objects.bulk_create(
+        [Recipe(user=user, **defaults) for _ in range(count)]
+    )
+
+
 class PublicRecipiesApiTests(TestCase):
     """Test the publicly available recipe API"""
 
@@ -62,29 +102,52 @@ class PublicRecipiesApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+@override_settings(MIDDLEWARE=[])
 class PrivateRecipiesApiTests(TestCase):
     """Test the authorized user recepi API"""
 
-    def setUp(self):
-        self.user = get_user_model().objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
             'alex@sharky.com',
             'test_pass_q23',
         )
+        cls.factory = APIRequestFactory()
+
+    def setUp(self):
         self.client = APIClient()
         self.client.force_authenticate(self.user)
 
-    def test_retrieve_recepies(self):
-        """Test retrieving recepies"""
-        sample_recipe(user=self.user)
-        sample_recipe(user=self.user)
+    def create_recipe(self, payload):
+        """Call the recipe create view directly, bypassing the client"""
+        request = self.factory.post(RECEPIES_URL, payload)
+        force_authenticate(request, user=self.user)
 
-        res = self.client.get(RECEPIES_URL)
+        return RECIPE_CREATE_VIEW(request)
 
-        recepies = Recipe.objects.all().order_by('-id')
-        serializer = RecipeSerializer(recepies, many=True)
+    def test_retrieve_recepies(self):
+        """Test retrieving recepies"""
+        recepies = bulk_sample_recipes(user=self.user, count=2)
+
+        # One query for the recipes and one for each prefetched relation
+        with self.assertNumQueries(3):
+            res = self.client.get(RECEPIES_URL)
+
+        expected = [
+            {
+                'id': recipe.id,
+                'title': 'Sample recipe',
+                'ingredients': [],
+                'tags': [],
+                'time_minutes': 10,
+                'price': '5.00',
+                'link': '',
+            }
+            for recipe in sorted(recepies, key=lambda r: r.id, reverse=True)
+        ]
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data, expected)
 
     def test_recepies_limited_to_user(self):
         """Test that recepies returned are for authenticated user"""
@@ -108,7 +171,8 @@ class PrivateRecipiesApiTests(TestCase):
         recipe.tags.add(sample_tag(self.user))
         recipe.ingredients.add(sample_ingredient(self.user))
 
-        res = self.client.get(detail_url(recipe.id))
+        with self.assertNumQueries(3):
+            res = self.client.get(detail_url(recipe.id))
 
         serializer = RecipeDetailSerializer(recipe)
 
@@ -123,7 +187,7 @@ class PrivateRecipiesApiTests(TestCase):
             'price': 5,
         }
 
-        res = self.client.post(RECEPIES_URL, payload)
+        res = self.create_recipe(payload)
 
         recipe = Recipe.objects.get(id=res.data['id'])
 
@@ -134,8 +198,7 @@ class PrivateRecipiesApiTests(TestCase):
 
     def test_create_recipe_with_tags_successful(self):
         """Test creating a new recipe"""
-        tag1 = sample_tag(user=self.user, name='Vegan')
-        tag2 = sample_tag(user=self.user, name='Dessert')
+        tag1, tag2 = bulk_sample_tags(self.user, ['Vegan', 'Dessert'])
         payload = {
             'title': 'Chocolate cheesecake',
             'time_minutes': 30,
@@ -143,20 +206,20 @@ class PrivateRecipiesApiTests(TestCase):
             'tags': [tag1.id, tag2.id],
         }
 
-        res = self.client.post(RECEPIES_URL, payload)
+        res = self.create_recipe(payload)
 
         recipe = Recipe.objects.get(id=res.data['id'])
-        tags = recipe.tags.all()
+        tag_ids = set(recipe.tags.values_list('id', flat=True))
 
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
-        self.assertEqual(tags.count(), 2)
-        self.assertIn(tag1, tags)
-        self.assertIn(tag2, tags)
+        self.assertEqual(tag_ids, {tag1.id, tag2.id})
 
     def test_create_recipe_with_ingredients_successful(self):
         """Test creating a new recipe"""
-        ingredient1 = sample_ingredient(user=self.user, name='Prawns')
-        ingredient2 = sample_ingredient(user=self.user, name='Ginger')
+        ingredient1, ingredient2 = bulk_sample_ingredients(
+            self.user,
+            ['Prawns', 'Ginger'],
+        )
         payload = {
             'title': 'Chocolate cheesecake',
             'time_minutes': 30,
@@ -164,15 +227,13 @@ class PrivateRecipiesApiTests(TestCase):
             'ingredients': [ingredient1.id, ingredient2.id],
         }
 
-        res = self.client.post(RECEPIES_URL, payload)
+        res = self.create_recipe(payload)
 
         recipe = Recipe.objects.get(id=res.data['id'])
-        ingredients = recipe.ingredients.all()
+        ingredient_ids = set(recipe.ingredients.values_list('id', flat=True))
 
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
-        self.assertEqual(ingredients.count(), 2)
-        self.assertIn(ingredient1, ingredients)
-        self.assertIn(ingredient2, ingredients)
+        self.assertEqual(ingredient_ids, {ingredient1.id, ingredient2.id})
 
     def test_partial_update_recipe(self):
         """Test updating a recipe with patch"""
@@ -189,15 +250,11 @@ class PrivateRecipiesApiTests(TestCase):
         url = detail_url(recipe.id)
 
         res = self.client.patch(url, payload)
-        recipe.refresh_from_db()
-
-        tags = recipe.tags.all()
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(recipe.title, payload['title'])
-        self.assertEqual(len(tags), 1)
-        self.assertIn(new_tag, tags)
-        self.assertEqual(recipe.time_minutes, time_minutes)
+        self.assertEqual(res.data['title'], payload['title'])
+        self.assertEqual(res.data['tags'], [new_tag.id])
+        self.assertEqual(res.data['time_minutes'], time_minutes)
 
     def test_full_update_recipe(self):
         """Test updating a recipe with put"""
@@ -212,41 +269,46 @@ class PrivateRecipiesApiTests(TestCase):
         url = detail_url(recipe.id)
 
         res = self.client.put(url, payload)
-        recipe.refresh_from_db()
-
-        tags = recipe.tags.all()
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(recipe.title, payload['title'])
-        self.assertEqual(recipe.time_minutes, payload['time_minutes'])
-        self.assertEqual(recipe.price, payload['price'])
-        self.assertEqual(len(tags), 0)
+        self.assertEqual(res.data['title'], payload['title'])
+        self.assertEqual(res.data['time_minutes'], payload['time_minutes'])
+        self.assertEqual(res.data['price'], '6.00')
+        self.assertEqual(res.data['tags'], [])
 
 
+@override_settings(MIDDLEWARE=[])
 class RecipeImageUploadTests(TestCase):
 
-    def setUp(self):
-        self.user = get_user_model().objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
             'alex@sharky.com',
             'test_pass_q23',
         )
+        cls.recipe = sample_recipe(user=cls.user)
+        cls.upload_url = image_upload_url(cls.recipe.id)
+
+    def setUp(self):
         self.client = APIClient()
         self.client.force_authenticate(self.user)
-        self.recipe = sample_recipe(user=self.user)
 
     def tearDown(self):
         self.recipe.image.delete()
 
     def test_upload_image_to_recipe_valid(self):
         """Test uploading an valid image to recipe"""
-        url = image_upload_url(self.recipe.id)
-
-        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
-            img = Image.new('RGB', (10, 10))
-            img.save(ntf, format='JPEG')
-            ntf.seek(0)
+        image = SimpleUploadedFile(
+            'sample.jpg',
+            SAMPLE_JPEG,
+            content_type='image/jpeg',
+        )
 
-            res = self.client.post(url, {'image': ntf}, format='multipart')
+        res = self.client.post(
+            self.upload_url,
+            {'image': image},
+            format='multipart',
+        )
 
         self.recipe.refresh_from_db()
 
@@ -256,8 +318,10 @@ class RecipeImageUploadTests(TestCase):
 
     def test_upload_image_to_recipe_invalid(self):
         """Test uploading an invalid image to recipe"""
-        url = image_upload_url(self.recipe.id)
-
-        res = self.client.post(url, {'image': 'notimage'}, format='multipart')
+        res = self.client.post(
+            self.upload_url,
+            {'image': 'notimage'},
+            format='multipart',
+        )
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
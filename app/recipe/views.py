@@ -46,7 +46,14 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
-        return self.queryset.filter(user=self.request.user)
+        queryset = self.queryset.filter(
+            user=self.request.user,
+        ).order_by('-id')
+
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.prefetch_related('tags', 'ingredients')
+
+        return queryset
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""